@@ -1,14 +1,21 @@
 from pathlib import Path
 
-import matplotlib.pyplot as plt
+import numpy as np
+from PIL import Image
 
 import scanreader as sr
 
 
+def _to_uint8(arr):
+    """ Rescale an array to the full [0, 255] range of uint8. """
+    arr = arr.astype(np.float64)
+    value_range = arr.max() - arr.min()
+    scale = 255.0 / value_range if value_range else 0.0  # constant image -> all zeros
+    return np.round((arr - arr.min()) * scale).astype(np.uint8)
+
+
 def quick_save_image(arr, save_path):
-    fig, ax = plt.subplots()
-    ax.imshow(arr[:, :, 5, 300])
-    plt.savefig(save_path)
+    Image.fromarray(_to_uint8(arr[:, :, 5, 300])).save(save_path)
 
 
 # set up directories
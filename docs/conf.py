@@ -32,11 +32,7 @@ release = 'v1.0.0'
 # extensions coming with Sphinx (named 'sphinx.ext.*') or your custom
 # ones.
 extensions = ["sphinx.ext.autodoc",
-              "sphinxcontrib.images",
-              "sphinxcontrib.video" ,
-              "sphinx.ext.intersphinx",
               "sphinx.ext.napoleon",
-              "sphinx.ext.autosectionlabel",
               "numpydoc" ]
 
 # Add any paths that contain templates here, relative to this directory.
@@ -62,10 +58,3 @@ source_suffix = ['.rst', '.md']
 # relative to this directory. They are copied after the builtin static files,
 # so a file named "default.css" will overwrite the builtin "default.css".
 html_static_path = ['_static']
-
-# sphinxcontrib.images config
-images_config = dict(backend='LightBox2',
-                     default_image_width='100%',
-                     default_show_title='True',
-                     default_group='default')
-
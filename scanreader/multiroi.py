@@ -1,5 +1,72 @@
 """ Some classes used for MultiROI scan processing. """
+from enum import IntEnum
+
 import numpy as np
+from tifffile.tifffile import matlabstr2py
+
+
+def _as_python_value(value):
+    """ Parse MATLAB-formatted strings from the raw tiff header, e.g. '[512 512]'.
+    Values already parsed (e.g. by tifffile's scanimage_metadata) are returned as is."""
+    if isinstance(value, bytes):
+        value = value.decode()
+    return matlabstr2py(value) if isinstance(value, str) else value
+
+
+def _isclose(a, b):
+    """ np.isclose(a, b) for scalars (same test and default tolerances) without numpy."""
+    return abs(a - b) <= 1e-08 + 1e-05 * abs(b)
+
+
+def _isclose_array(a, b):
+    """ Elementwise (broadcasting) version of _isclose."""
+    return np.abs(a - b) <= 1e-08 + 1e-05 * np.abs(b)
+
+
+def _round_to_even(values):
+    """ Round each value to the closest even integer (ties as in round(), half to even)."""
+    return np.round(values / 2).astype(np.int64) * 2
+
+
+def _interpolate_rows(x, xp, fp):
+    """ Linearly interpolate all columns of fp at x.
+
+    Same as np.array([np.interp(x, xp, fp[:, k]) for k in range(fp.shape[1])]).
+
+    Args:
+        x: A float. Point at which to interpolate.
+        xp: A (N,) array. Increasing x-coordinates of the data points.
+        fp: A (N, K) array. Values at each of the data points.
+
+    Returns:
+        A (K,) array. Interpolated values (clamped to fp[0]/fp[-1] outside of xp).
+    """
+    return np.array([np.interp(x, xp, fp[:, k]) for k in range(fp.shape[1])])
+
+
+def _interpolate_rows_batch(xs, xp, fp):
+    """ Vectorized _interpolate_rows: interpolate all columns of fp at each of xs.
+
+    One np.interp call per column (over all of xs), so results are bit-identical to
+    calling np.interp at each point.
+
+    Args:
+        xs: A (M,) array. Points at which to interpolate.
+        xp: A (N,) array. Increasing x-coordinates of the data points.
+        fp: A (N, K) array. Values at each of the data points.
+
+    Returns:
+        A (M, K) array. Row i has the values interpolated at xs[i].
+    """
+    values = np.empty([len(xs), fp.shape[1]], dtype=np.float64)
+    for k in range(fp.shape[1]):
+        values[:, k] = np.interp(xs, xp, fp[:, k])
+    return values
+
+
+def _shift_slices(slices, delta):
+    """ Shift a list of slices by delta (positions), e.g., to paste them further down."""
+    return [slice(s.start + delta, s.stop + delta) for s in slices]
 
 
 class ROI:
@@ -12,13 +79,23 @@ class ROI:
     ----------
     roi_info : dict
         A dictionary containing the definition of the ROI extracted from the TIFF header.
+        Values can be already parsed (as in tifffile's scanimage_metadata) or raw MATLAB
+        strings (e.g. '[512 512]').
 
     Attributes
     ----------
     roi_info : dict
         Stores the original ROI information from the TIFF file.
+    is_discrete_plane_mode_on : bool
+        Whether the ROI only exists at its scanfield depths (no interpolation between them).
     _scanfields : list of Scanfield
-        Cached list of scanfields that form this ROI.
+        Cached list of scanfields that form this ROI. Only created if needed (interpolation
+        works directly on _sf_depths and _sf_table).
+    _sf_depths : np.ndarray
+        Cached (N,) array with the depth of each scanfield, sorted in increasing order.
+    _sf_table : np.ndarray
+        Cached (N, 6) array with the height_px, width_px, y_center_coordinate,
+        x_center_coordinate, height_in_degrees and width_in_degrees of each scanfield.
     """
     def __init__(self, roi_info):
         """
@@ -31,7 +108,14 @@ class ROI:
 
         """
         self.roi_info = roi_info
+        self.is_discrete_plane_mode_on = bool(_as_python_value(roi_info.get('discretePlaneMode', 0)))
         self._scanfields = None
+        self._sf_depths = None
+        self._sf_table = None
+        self._sf_header_depths = None  # depths as written in roi_info (sorted)
+        self._depth_range = None  # (min, max) depth of the scanfields
+        self._scanfields_by_depth = None
+        self._has_increasing_depths = None
 
     @property
     def scanfields(self):
@@ -39,53 +123,91 @@ class ROI:
             self._scanfields = self._create_scanfields()
         return self._scanfields
 
-    @property
-    def is_discrete_plane_mode_on(self):
-        return bool(self.roi_info['discretePlaneMode'])
-
-    def _create_scanfields(self):
+    def _load_scanfield_table(self):
         """
-        Create all the scanfields that form this ROI. Each roi can have multiple scanfields, each with its own depth.
+        Read the definition of all scanfields in this ROI into arrays sorted by depth
+        (_sf_depths and _sf_table). Each roi can have multiple scanfields, each with its own depth.
 
         .. note::
-            This method is called only once, when the scanfields are first accessed.
+            This method only reads the scanfields once, the first time they are needed.
             This namespace only has access to frame-specific metadata, so it cannot convert degrees to microns
             as the objective resolution is attached to the .tiff header:
 
             `header['SI.objectiveResolution']`
         """
+        if self._sf_table is not None:  # already read
+            return
+
         # Get scanfield configuration info
         scanfield_infos = self.roi_info['scanfields']
         if not isinstance(scanfield_infos, list):
             scanfield_infos = [scanfield_infos] # make list if single scanfield
 
         # Get scanfield depths
-        scanfield_depths = self.roi_info['zs']
+        scanfield_depths = _as_python_value(self.roi_info['zs'])
         if not isinstance(scanfield_depths, list):
             scanfield_depths = [scanfield_depths]
 
+        # All scanfields are used: scanfield_info['enable'] is always 1 even if ROI is disabled
+        num_scanfields = min(len(scanfield_infos), len(scanfield_depths))  # pairs as in zip()
+        scanfield_infos = scanfield_infos[:num_scanfields]
+        scanfield_depths = scanfield_depths[:num_scanfields]
+
+        if num_scanfields == 0:  # ROI without scanfields (e.g., zs=[]): never present
+            self._sf_depths = np.empty(0, dtype=np.float64)
+            self._sf_table = np.empty([0, 6], dtype=np.float64)
+            self._sf_header_depths = []
+            self._has_increasing_depths = True
+            return
+
+        # (x_center_coordinate, y_center_coordinate) number of pixels, center and size (in deg) of each scanfield
+        pixel_resolutions = np.asarray([_as_python_value(sfi['pixelResolutionXY']) for sfi
+                                        in scanfield_infos], dtype=np.float64)
+        centers = np.asarray([_as_python_value(sfi['centerXY']) for sfi in scanfield_infos],
+                             dtype=np.float64)
+        sizes = np.asarray([_as_python_value(sfi['sizeXY']) for sfi in scanfield_infos],
+                           dtype=np.float64)
+
+        # Sort them by depth (to ease interpolation)
+        depths = np.asarray(scanfield_depths, dtype=np.float64)
+        order = np.argsort(depths, kind='stable')
+
+        # One row per scanfield
+        self._sf_depths = depths[order]
+        self._sf_table = np.column_stack([pixel_resolutions[:, 1], pixel_resolutions[:, 0],
+                                          centers[:, 1], centers[:, 0],
+                                          sizes[:, 1], sizes[:, 0]])[order]
+        self._sf_header_depths = [scanfield_depths[i] for i in order]
+        self._depth_range = (float(self._sf_depths[0]), float(self._sf_depths[-1]))
+        self._has_increasing_depths = bool(np.all(np.diff(self._sf_depths) > 0))
+
+    def _create_scanfields(self):
+        """ Create Scanfield objects from the rows of the scanfield table (sorted by depth).
+
+        .. note::
+            This method is called only once, when the scanfields are first accessed.
+        """
+        self._load_scanfield_table()
+
         scanfields = []
-        for scanfield_info, scanfield_depth in zip(scanfield_infos, scanfield_depths):
-            # if scanfield_info['enable']: # this is always 1 even if ROI is disabled
-
-            # tuple with the number of pixels in (x_center_coordinate, y_center_coordinate)
-            width_px, height_px = scanfield_info['pixelResolutionXY']
-            # tuple with the center of the ROI in deg(x_center_coordinate, y_center_coordinate)
-            xcenter, ycenter = scanfield_info['centerXY']
-            # tuple with the size of the ROI in deg(x_center_coordinate, y_center_coordinate)
-            size_in_x, size_in_y = scanfield_info['sizeXY']
-
-            # Create scanfield
-            new_scanfield = Scanfield(height_px=height_px, width_px=width_px, depth=scanfield_depth,
-                                      y_center_coordinate=ycenter, x_center_coordinate=xcenter, height_in_degrees=size_in_y,
+        for depth, (height_px, width_px, ycenter, xcenter, size_in_y, size_in_x) in zip(
+                self._sf_header_depths, self._sf_table.tolist()):
+            new_scanfield = Scanfield(height_px=int(height_px), width_px=int(width_px),
+                                      depth=depth, y_center_coordinate=ycenter,
+                                      x_center_coordinate=xcenter, height_in_degrees=size_in_y,
                                       width_in_degrees=size_in_x)
             scanfields.append(new_scanfield)
 
-        # Sort them by depth (to ease interpolation)
-        scanfields = sorted(scanfields, key=lambda scanfield: scanfield.depth)
-
         return scanfields
 
+    def _scanfield_at_depth(self, depth):
+        """ Scanfield defined at this depth (the one defined last if many) or None."""
+        if self._scanfields_by_depth is None:
+            # Later scanfields overwrite earlier ones at the same depth
+            self._scanfields_by_depth = {scanfield.depth: scanfield for scanfield in
+                                         self.scanfields}
+        return self._scanfields_by_depth.get(depth)
+
     def get_field_at(self, scanning_depth):
         """ 
         Interpolates between the ROI scanfields to generate the 2-d field at the
@@ -103,53 +225,84 @@ class ROI:
                 the one defined last.
         """
         field = None
-
-        if self.is_discrete_plane_mode_on: # only check at each scanfield depth
-            for scanfield in self.scanfields:
-                if scanning_depth == scanfield.depth:
-                    field = scanfield.as_field()
+        self._load_scanfield_table()
+
+        if len(self._sf_depths) == 0:  # no scanfields
+            pass
+        elif self.is_discrete_plane_mode_on: # only check at each scanfield depth
+            scanfield = self._scanfield_at_depth(scanning_depth)
+            if scanfield is not None:
+                field = scanfield.as_field()
         else:
-            if len(self.scanfields) == 1: # single scanfield extending from -inf to inf
+            if len(self._sf_depths) == 1: # single scanfield extending from -inf to inf
                 field = self.scanfields[0].as_field()
                 field.depth = scanning_depth
 
             else: # interpolate between scanfields
-                scanfield_depths = [sf.depth for sf in self.scanfields]
-                valid_range = range(min(scanfield_depths), max(scanfield_depths) + 1)
-                if scanning_depth in valid_range:
-                    field = Field()
+                min_depth, max_depth = self._depth_range
+                if min_depth <= scanning_depth <= max_depth:
 
-                    scanfield_heights = [sf.height_px for sf in self.scanfields]
-                    field.height_px = np.interp(scanning_depth, scanfield_depths,
-                                                scanfield_heights)
-                    field.height_px = int(round(field.height_px / 2)) * 2 # round to the closest even
+                    # Interpolation results are meaningless if depths are not increasing
+                    assert self._has_increasing_depths  # check that the depths are in increasing order
 
-                    scanfield_widths = [sf.width_px for sf in self.scanfields]
+                    values = _interpolate_rows(scanning_depth, self._sf_depths, self._sf_table)
+                    height_px = int(round(values[0] / 2)) * 2  # round to the closest even
+                    width_px = int(round(values[1] / 2)) * 2
+                    field = self._create_interpolated_field(scanning_depth, height_px, width_px,
+                                                            values)
 
-                    # The x_center_coordinate - coordinate sequence is expected to be increasing, but this is not explicitly enforced.
-                    # if the sequence `xp` is non-increasing, interpolation results are meaningless.
-                    assert np.all(np.diff(xp) > 0)  # check that the depths are in increasing order
-
-                    field.width_px = np.interp(scanning_depth, scanfield_depths,
-                                               scanfield_widths)
-                    field.width_px = int(round(field.width_px / 2)) * 2 # round to the closest even
-
-                    field.depth = scanning_depth
-
-                    scanfield_ys = [sf.y_center_coordinate for sf in self.scanfields]
-                    field.y_center_coordinate = np.interp(scanning_depth, scanfield_depths, scanfield_ys)
+        return field
 
-                    scanfield_xs = [sf.x_center_coordinate for sf in self.scanfields]
-                    field.x_center_coordinate = np.interp(scanning_depth, scanfield_depths, scanfield_xs)
+    def get_fields_at(self, scanning_depths):
+        """
+        Generate the 2-d fields at each of the desired depths.
 
-                    scanfield_heights = [sf.height_in_degrees for sf in self.scanfields]
-                    field.height_in_degrees = np.interp(scanning_depth, scanfield_depths,
-                                                        scanfield_heights)
+        Same as [self.get_field_at(depth) for depth in scanning_depths] but interpolating
+        between scanfields at all depths in one go.
 
-                    scanfield_widths = [sf.width_in_degrees for sf in self.scanfields]
-                    field.width_in_degrees = np.interp(scanning_depth, scanfield_depths,
-                                                       scanfield_widths)
+        Args:
+            scanning_depths: List of integers. Depths at which we want to obtain fields.
 
+        Returns:
+            List of Field objects (or None if the ROI is not present at that depth).
+        """
+        self._load_scanfield_table()
+        if len(self._sf_depths) == 0:  # no scanfields
+            return [None] * len(scanning_depths)
+        if self.is_discrete_plane_mode_on or len(self._sf_depths) == 1:  # no interpolation
+            return [self.get_field_at(scanning_depth) for scanning_depth in scanning_depths]
+
+        min_depth, max_depth = self._depth_range
+        in_range = [min_depth <= depth <= max_depth for depth in scanning_depths]
+        if any(in_range):
+            assert self._has_increasing_depths  # check that the depths are in increasing order
+        depths_in_range = [depth for depth, is_in in zip(scanning_depths, in_range) if is_in]
+        values = _interpolate_rows_batch(np.asarray(depths_in_range, dtype=np.float64),
+                                         self._sf_depths, self._sf_table)
+        sizes_px = _round_to_even(values[:, :2]).tolist()  # (height_px, width_px) per depth
+        rows = iter(zip(sizes_px, values))
+
+        fields = []
+        for depth, is_in in zip(scanning_depths, in_range):
+            field = None
+            if is_in:
+                (height_px, width_px), row = next(rows)
+                field = self._create_interpolated_field(depth, height_px, width_px, row)
+            fields.append(field)
+        return fields
+
+    @staticmethod
+    def _create_interpolated_field(scanning_depth, height_px, width_px, values):
+        """ Create the field at scanning_depth from its (already rounded) size in pixels
+        and a row of interpolated scanfield attributes (ordered as in _sf_table)."""
+        field = Field()
+        field.height_px = height_px
+        field.width_px = width_px
+        field.depth = scanning_depth
+        field.y_center_coordinate = values[2]
+        field.x_center_coordinate = values[3]
+        field.height_in_degrees = values[4]
+        field.width_in_degrees = values[5]
         return field
 
 
@@ -159,15 +312,15 @@ class Scanfield:
 
     Attributes
     ----------
-    height : int
+    height_px : int
         Height of the field in pixels.
-    width : int
+    width_px : int
         Width of the field in pixels.
     depth : float
         Depth at which this field was recorded, in microns relative to the absolute Z-coordinate.
     y_center_coordinate : float
         Y-coordinate of the center of the field in scan angle degrees.
-    x : float
+    x_center_coordinate : float
         X-coordinate of the center of the field in scan angle degrees.
     height_in_degrees : float
         Height of the field in degrees of the scan angle.
@@ -175,6 +328,9 @@ class Scanfield:
         Width of the field in degrees of the scan angle.
 
     """
+    __slots__ = ('height_px', 'width_px', 'depth', 'y_center_coordinate', 'x_center_coordinate',
+                 'height_in_degrees', 'width_in_degrees')
+
     def __init__(self, height_px=None, width_px=None, depth=None, y_center_coordinate=None, x_center_coordinate=None,
                  height_in_degrees=None, width_in_degrees=None):
         """
@@ -259,6 +415,9 @@ class Field(Scanfield):
     - The attributes `height_px`, `width_px`, `x_center_coordinate`, `y_center_coordinate`, `height_in_degrees`, and `width_in_degrees` are adjusted
       accordingly when fields are joined.
     """
+    __slots__ = ('yslices', 'xslices', 'output_yslices', 'output_xslices', 'slice_id', 'roi_ids',
+                 'offsets', '_roi_mask', '_offset_mask')  # Scanfield attributes are inherited
+
     def __init__(self, height_px=None, width_px=None, depth=None, y_center_coordinate=None, x_center_coordinate=None,
                  height_in_degrees=None, width_in_degrees=None, yslices=None,
                  xslices=None, output_yslices=None, output_xslices=None, slice_id=None,
@@ -315,6 +474,8 @@ class Field(Scanfield):
         self.slice_id = slice_id
         self.roi_ids = roi_ids
         self.offsets = offsets
+        self._roi_mask = None  # cached masks, reset when the field changes (join_with)
+        self._offset_mask = None
 
     @property
     def has_contiguous_subfields(self):
@@ -323,20 +484,74 @@ class Field(Scanfield):
 
     @property
     def roi_mask(self):
-        """ Mask of the size of the field. Each pixel shows the ROI from where it comes."""
-        mask = np.full([self.height_px, self.width_px], -1, dtype=np.int8)
-        for roi_id, output_yslice, output_xslice in zip(self.roi_ids, self.output_yslices,
-                                                        self.output_xslices):
-            mask[output_yslice, output_xslice] = roi_id
-        return mask
+        """ Mask of the size of the field. Each pixel shows the ROI from where it comes.
+        Computed once and cached as a read-only array (reset by join_with)."""
+        if self._roi_mask is None:
+            self._roi_mask = self._create_roi_mask()
+            self._roi_mask.flags.writeable = False  # shared between accesses
+        return self._roi_mask
 
     @property
     def offset_mask(self):
-        """ Mask of the size of the field. Each pixel shows its time offset in seconds."""
-        mask = np.full([self.height_px, self.width_px], -1, dtype=np.float32)
-        for offsets, output_yslice, output_xslice in zip(self.offsets, self.output_yslices,
-                                                        self.output_xslices):
-            mask[output_yslice, output_xslice] = offsets
+        """ Mask of the size of the field. Each pixel shows its time offset in seconds.
+        Computed once and cached as a read-only array (reset by join_with)."""
+        if self._offset_mask is None:
+            self._offset_mask = self._create_mask(self.offsets, dtype=np.float32)
+            self._offset_mask.flags.writeable = False  # shared between accesses
+        return self._offset_mask
+
+    def _subfields_cover_field(self):
+        """ Whether the (non-overlapping) output slices of all subfields tile the field."""
+        num_covered_pixels = 0
+        for output_yslice, output_xslice in zip(self.output_yslices, self.output_xslices):
+            num_covered_pixels += (len(range(*output_yslice.indices(self.height_px))) *
+                                   len(range(*output_xslice.indices(self.width_px))))
+        return num_covered_pixels == self.height_px * self.width_px
+
+    def _create_roi_mask(self):
+        """ Create the roi mask. If subfields tile the field along a single axis (e.g.,
+        joined side by side), ROI ids are set along that axis and broadcast to the rest
+        of the field instead of pasted subfield by subfield."""
+        if self._subfields_cover_field():
+            full_height = (0, self.height_px, 1)
+            full_width = (0, self.width_px, 1)
+            if all(s.indices(self.height_px) == full_height for s in self.output_yslices):
+                column_ids = np.empty(self.width_px, dtype=np.int8)
+                for roi_id, output_xslice in zip(self.roi_ids, self.output_xslices):
+                    column_ids[output_xslice] = roi_id
+                mask = np.empty([self.height_px, self.width_px], dtype=np.int8)
+                mask[:] = column_ids
+                return mask
+            if all(s.indices(self.width_px) == full_width for s in self.output_xslices):
+                row_ids = np.empty(self.height_px, dtype=np.int8)
+                for roi_id, output_yslice in zip(self.roi_ids, self.output_yslices):
+                    row_ids[output_yslice] = roi_id
+                mask = np.empty([self.height_px, self.width_px], dtype=np.int8)
+                mask[:] = row_ids[:, None]
+                return mask
+
+        return self._create_mask(self.roi_ids, dtype=np.int8)
+
+    def _create_mask(self, values, dtype):
+        """ Paste the value of each subfield in its output slices. Pixels not covered by
+        any subfield are set to -1.
+
+        Args:
+            values: List with one value (scalar or array) per subfield.
+            dtype: Data type of the mask.
+
+        Returns:
+            A height_px x width_px array.
+        """
+        shape = [self.height_px, self.width_px]
+        if self._subfields_cover_field():  # always the case for non-joined fields
+            mask = np.empty(shape, dtype=dtype)  # every pixel is overwritten below
+        else:
+            mask = np.full(shape, -1, dtype=dtype)
+
+        for value, output_yslice, output_xslice in zip(values, self.output_yslices,
+                                                       self.output_xslices):
+            mask[output_yslice, output_xslice] = value
         return mask
 
     def _type_of_contiguity(self, field2):
@@ -349,81 +564,137 @@ class Field(Scanfield):
             An integer {NONCONTIGUOUS = 0, ABOVE = 1, BELOW = 2, LEFT = 3, RIGHT = 4}.
                Whether field 2 is above, below, to the left or to the right of this field.
         """
-        position = Position.NONCONTIGUOUS
-        if np.isclose(self.width_in_degrees, field2.width_in_degrees):
-            expected_distance = self.height_in_degrees / 2 + field2.height_in_degrees / 2
-            if np.isclose(self.y_center_coordinate, field2.y_center_coordinate + expected_distance):
-                position = Position.ABOVE
-            if np.isclose(field2.y_center_coordinate, self.y_center_coordinate + expected_distance):
-                position = Position.BELOW
-        if np.isclose(self.height_in_degrees, field2.height_in_degrees):
+        # Fields in the same row (or column) can only touch along x (or y), so at most one
+        # position matches; the sign of the center distance tells which one to test.
+        # Diagonal neighbours are in neither and are NONCONTIGUOUS.
+        if (_isclose(self.height_in_degrees, field2.height_in_degrees) and
+                _isclose(field2.y_center_coordinate, self.y_center_coordinate)):  # same row
             expected_distance = self.width_in_degrees / 2 + field2.width_in_degrees / 2
-            if np.isclose(self.x_center_coordinate, field2.x_center_coordinate + expected_distance):
-                position = Position.LEFT
-            else:
-                position = Position.RIGHT
-        return position
+            if field2.x_center_coordinate - self.x_center_coordinate > 0:
+                if _isclose(field2.x_center_coordinate, self.x_center_coordinate + expected_distance):
+                    return Position.RIGHT
+            elif _isclose(self.x_center_coordinate, field2.x_center_coordinate + expected_distance):
+                return Position.LEFT
+        if (_isclose(self.width_in_degrees, field2.width_in_degrees) and
+                _isclose(field2.x_center_coordinate, self.x_center_coordinate)):  # same column
+            expected_distance = self.height_in_degrees / 2 + field2.height_in_degrees / 2
+            if field2.y_center_coordinate - self.y_center_coordinate > 0:
+                if _isclose(field2.y_center_coordinate, self.y_center_coordinate + expected_distance):
+                    return Position.BELOW
+            elif _isclose(self.y_center_coordinate, field2.y_center_coordinate + expected_distance):
+                return Position.ABOVE
+        return Position.NONCONTIGUOUS
+
+    @staticmethod
+    def pairwise_contiguity(fields):
+        """ Compute how each field is contiguous to every other field.
+
+        Vectorized version of _type_of_contiguity over all pairs of fields.
+
+        Args:
+            fields: List of N field objects.
+
+        Returns:
+            An N x N int8 array. Element (i, j) is the Position of fields[j] with respect
+                to fields[i], i.e., fields[i]._type_of_contiguity(fields[j]).
+        """
+        ys = np.array([field.y_center_coordinate for field in fields], dtype=np.float64)
+        xs = np.array([field.x_center_coordinate for field in fields], dtype=np.float64)
+        heights = np.array([field.height_in_degrees for field in fields], dtype=np.float64)
+        widths = np.array([field.width_in_degrees for field in fields], dtype=np.float64)
+
+        positions = np.full([len(fields), len(fields)], Position.NONCONTIGUOUS, dtype=np.int8)
+
+        same_width = (_isclose_array(widths[:, None], widths[None, :]) &
+                      _isclose_array(xs[None, :], xs[:, None]))  # and same column
+        is_after = ys[None, :] - ys[:, None] > 0  # fields[j] has larger y than fields[i]
+        expected_distances = heights[:, None] / 2 + heights[None, :] / 2
+        is_below = is_after & _isclose_array(ys[None, :], ys[:, None] + expected_distances)
+        is_above = ~is_after & _isclose_array(ys[:, None], ys[None, :] + expected_distances)
+        positions[same_width & is_below] = Position.BELOW
+        positions[same_width & is_above] = Position.ABOVE
+
+        same_height = (_isclose_array(heights[:, None], heights[None, :]) &
+                       _isclose_array(ys[None, :], ys[:, None]))  # and same row
+        is_after = xs[None, :] - xs[:, None] > 0  # fields[j] has larger x than fields[i]
+        expected_distances = widths[:, None] / 2 + widths[None, :] / 2
+        is_right = is_after & _isclose_array(xs[None, :], xs[:, None] + expected_distances)
+        is_left = ~is_after & _isclose_array(xs[:, None], xs[None, :] + expected_distances)
+        positions[same_height & is_right] = Position.RIGHT
+        positions[same_height & is_left] = Position.LEFT
+
+        return positions
 
     def is_contiguous_to(self, field2):
         """ Whether this field is contiguous to field2."""
+        # Quick rejection: contiguous fields share their height or width
+        if not (_isclose(self.width_in_degrees, field2.width_in_degrees) or
+                _isclose(self.height_in_degrees, field2.height_in_degrees)):
+            return False
         return not (self._type_of_contiguity(field2) == Position.NONCONTIGUOUS)
 
-    def join_with(self, field2):
+    def join_with(self, field2, contiguity=None):
         """
         Update attributes of this field to incorporate field2. Field2 is NOT changed.
 
         Args:
             field2: A second field object.
+            contiguity: Position of field2 with respect to this field, if already known
+                (e.g., from pairwise_contiguity). Computed with _type_of_contiguity if None.
+
+        Raises:
+            ValueError: If field2 is not contiguous to this field.
         """
-        contiguity = self._type_of_contiguity(field2)
-        if contiguity in [Position.ABOVE, Position.BELOW]:  # contiguous in y_center_coordinate axis
+        if contiguity is None:
+            contiguity = self._type_of_contiguity(field2)
+        if contiguity == Position.NONCONTIGUOUS:
+            raise ValueError('Cannot join non-contiguous fields')
+
+        # Cached masks are no longer valid
+        self._roi_mask = None
+        self._offset_mask = None
+
+        if contiguity in (Position.ABOVE, Position.BELOW):  # contiguous in y_center_coordinate axis
             # Compute some specific attributes
             if contiguity == Position.ABOVE:  # field2 is above/atop self
                 new_y = field2.y_center_coordinate + (self.height_in_degrees / 2)
-                output_yslices1 = [slice(s.start + field2.height_px, s.stop + field2.height_px)
-                                   for s in self.output_yslices]
-                output_yslices2 = field2.output_yslices
+                self.output_yslices = _shift_slices(self.output_yslices, field2.height_px)
+                self.output_yslices.extend(field2.output_yslices)
             else:  # field2 is below self
                 new_y = self.y_center_coordinate + (field2.height_in_degrees / 2)
-                output_yslices1 = self.output_yslices
-                output_yslices2 = [slice(s.start + self.height_px, s.stop + self.height_px) for
-                                   s in field2.output_yslices]
+                self.output_yslices.extend(_shift_slices(field2.output_yslices, self.height_px))
             # Set new attributes
             self.y_center_coordinate = new_y
             self.height_px += field2.height_px
             self.height_in_degrees += field2.height_in_degrees
-            self.output_yslices = output_yslices1 + output_yslices2
-            self.output_xslices = self.output_xslices + field2.output_xslices
-        if contiguity in [Position.LEFT, Position.RIGHT]:  # contiguous in x_center_coordinate axis
+            self.output_xslices.extend(field2.output_xslices)
+        if contiguity in (Position.LEFT, Position.RIGHT):  # contiguous in x_center_coordinate axis
             # Compute some specific attributes
             if contiguity == Position.LEFT:  # field2 is to the left of self
                 new_x = field2.x_center_coordinate + (self.width_in_degrees / 2)
-                output_xslices1 = [slice(s.start + field2.width_px, s.stop + field2.width_px)
-                                   for s in self.output_xslices]
-                output_xslices2 = field2.output_xslices
+                self.output_xslices = _shift_slices(self.output_xslices, field2.width_px)
+                self.output_xslices.extend(field2.output_xslices)
             else:  # field2 is to the right of self
                 new_x = self.x_center_coordinate + (field2.width_in_degrees / 2)
-                output_xslices1 = self.output_xslices
-                output_xslices2 = [slice(s.start + self.width_px, s.stop + self.width_px) for s
-                                   in field2.output_xslices]
+                self.output_xslices.extend(_shift_slices(field2.output_xslices, self.width_px))
 
             # Set new attributes
             self.x_center_coordinate = new_x
             self.width_px += field2.width_px
             self.width_in_degrees += field2.width_in_degrees
-            self.output_yslices = self.output_yslices + field2.output_yslices
-            self.output_xslices = output_xslices1 + output_xslices2
+            self.output_yslices.extend(field2.output_yslices)
 
         # yslices and xslices just get appended regardless of the type of contiguity
-        self.yslices = self.yslices + field2.yslices
-        self.xslices = self.xslices + field2.xslices
+        self.yslices.extend(field2.yslices)
+        self.xslices.extend(field2.xslices)
 
         # Append roi ids and offsets
-        self.roi_ids = self.roi_ids + field2.roi_ids
-        self.offsets = self.offsets + field2.offsets
+        self.roi_ids.extend(field2.roi_ids)
+        self.offsets.extend(field2.offsets)
 
 
-class Position:
+class Position(IntEnum):
+    """ Position of a field relative to another one (see Field._type_of_contiguity). """
     NONCONTIGUOUS = 0
     ABOVE = 1
     BELOW = 2
@@ -23,7 +23,6 @@ BaseScan
                 Scan2020
     ScanMultiRoi
 """
-import itertools
 import re
 
 import numpy as np
@@ -32,7 +31,7 @@ from tifffile.tifffile import matlabstr2py
 
 from . import utils
 from .exceptions import FieldDimensionMismatch
-from .multiroi import ROI
+from .multiroi import ROI, Field, Position
 
 
 class BaseScan():
@@ -732,11 +731,13 @@ class ScanMultiROI(NewerScan, BaseScan):
 
     @property
     def field_masks(self):
-        return [field.roi_mask for field in self.fields]
+        """ ROI id of each pixel in each field. Writable copies of the cached masks."""
+        return [field.roi_mask.copy() for field in self.fields]
 
     @property
     def field_offsets(self):
-        return [field.offset_mask for field in self.fields]
+        """ Seconds elapsed between start of frame scanning and each pixel (writable copies)."""
+        return [field.offset_mask.copy() for field in self.fields]
 
     @property
     def field_heights_in_microns(self):
@@ -813,10 +814,11 @@ class ScanMultiROI(NewerScan, BaseScan):
         """ Go over each slice depth and each roi generating the scanned fields. """
         fields = []
         previous_lines = 0
+        roi_fields = [roi.get_fields_at(self.scanning_depths) for roi in self.rois]
         for slice_id, scanning_depth in enumerate(self.scanning_depths):
             next_line_in_page = 0 # each slice is one tiff page
-            for roi_id, roi in enumerate(self.rois):
-                new_field = roi.get_field_at(scanning_depth)
+            for roi_id in range(len(self.rois)):
+                new_field = roi_fields[roi_id][slice_id]
 
                 if new_field is not None:
                     if next_line_in_page + new_field.height_px > self._page_height:
@@ -872,19 +874,24 @@ class ScanMultiROI(NewerScan, BaseScan):
             while two_fields_were_joined: # repeat until no fields were joined
                 two_fields_were_joined = False
 
-                fields = filter(lambda field: field.depth == scanning_depth, self.fields)
-                for field1, field2 in itertools.combinations(fields, 2):
+                fields = [field for field in self.fields if field.depth == scanning_depth]
 
-                    if field1.is_contiguous_to(field2):
-                        # Change info in field 1 to reflect the union
-                        field1.join_with(field2)
+                # Classify all pairs at once; take the first in itertools.combinations order
+                positions = Field.pairwise_contiguity(fields)
+                is_contiguous = np.triu(positions != Position.NONCONTIGUOUS, k=1)
+                contiguous_pairs = np.argwhere(is_contiguous)
+                if len(contiguous_pairs) > 0:
+                    i, j = contiguous_pairs[0]
+                    field1, field2 = fields[i], fields[j]
 
-                        # Delete field 2 in self.fields
-                        self.fields.remove(field2)
+                    # Change info in field 1 to reflect the union
+                    field1.join_with(field2, contiguity=Position(positions[i, j]))
 
-                        # Restart join contiguous search (at while)
-                        two_fields_were_joined = True
-                        break
+                    # Delete field 2 in self.fields
+                    self.fields.remove(field2)
+
+                    # Restart join contiguous search (at while)
+                    two_fields_were_joined = True
 
     def __getitem__(self, key):
         # Fill key to size 5 (raises IndexError if more than 5)
@@ -895,18 +902,20 @@ class ScanMultiROI(NewerScan, BaseScan):
             utils.check_index_type(i, index)
 
         # Check each dimension is in bounds
+        field_heights = self.field_heights  # computed once, not per field
+        field_widths = self.field_widths
         utils.check_index_is_in_bounds(0, full_key[0], self.num_fields)
         for field_id in utils.listify_index(full_key[0], self.num_fields):
-            utils.check_index_is_in_bounds(1, full_key[1], self.field_heights[field_id])
-            utils.check_index_is_in_bounds(2, full_key[2], self.field_widths[field_id])
+            utils.check_index_is_in_bounds(1, full_key[1], field_heights[field_id])
+            utils.check_index_is_in_bounds(2, full_key[2], field_widths[field_id])
         utils.check_index_is_in_bounds(3, full_key[3], self.num_channels)
         utils.check_index_is_in_bounds(4, full_key[4], self.num_frames)
 
         # Get fields, channels and frames as lists
         field_list = utils.listify_index(full_key[0], self.num_fields)
-        y_lists = [utils.listify_index(full_key[1], self.field_heights[field_id]) for
+        y_lists = [utils.listify_index(full_key[1], field_heights[field_id]) for
                    field_id in field_list]
-        x_lists = [utils.listify_index(full_key[2], self.field_widths[field_id]) for
+        x_lists = [utils.listify_index(full_key[2], field_widths[field_id]) for
                    field_id in field_list]
         channel_list = utils.listify_index(full_key[3], self.num_channels)
         frame_list = utils.listify_index(full_key[4], self.num_frames)
@@ -1008,10 +1017,11 @@ class LBMScanMultiROI(ScanMultiROI):
 
         fields = []
         previous_lines = 0
+        roi_fields = [roi.get_fields_at(self.scanning_depths) for roi in self.rois]
         for slice_id, scanning_depth in enumerate(self.scanning_depths):
             next_line_in_page = 0
-            for roi_id, roi in enumerate(self.rois):
-                new_field = roi.get_field_at(scanning_depth)
+            for roi_id in range(len(self.rois)):
+                new_field = roi_fields[roi_id][slice_id]
 
                 if new_field is not None:
                     if next_line_in_page + new_field.height_px > self._page_height:
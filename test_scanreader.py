@@ -10,6 +10,7 @@ from os import path
 import numpy as np
 import scanreader
 from scanreader.exceptions import ScanReaderException
+from scanreader.multiroi import ROI, Field, Position, _as_python_value
 
 # Get data directory
 data_dir = path.join(path.dirname(path.abspath(__file__)), 'data')
@@ -736,4 +737,247 @@ class StackTest(TestCase):
         first_channel = scan[:, :, :, 0, :]
         self.assertEqualShapeAndSum(first_channel, (204, 360, 120, 10), 26825949131)
         first_frame = scan[:, :, :, :, 0]
-        self.assertEqualShapeAndSum(first_frame, (204, 360, 120, 2), 2952050950)
\ No newline at end of file
+        self.assertEqualShapeAndSum(first_frame, (204, 360, 120, 2), 2952050950)
+
+
+def make_roi_info(zs, pixel_resolutions, centers, sizes, discrete_plane_mode=0):
+    """ ROI definition (as in the tiff header) with one scanfield per depth in zs."""
+    scanfields = [{'pixelResolutionXY': list(resolution), 'centerXY': list(center),
+                   'sizeXY': list(size)} for resolution, center, size in
+                  zip(pixel_resolutions, centers, sizes)]
+    return {'zs': list(zs), 'scanfields': scanfields, 'discretePlaneMode': discrete_plane_mode}
+
+
+def make_field(y, x, height_px, width_px, roi_id, height_in_degrees=None, width_in_degrees=None):
+    """ Non-joined field read from page[0:height_px, 0:width_px] (1 pixel = 1 degree)."""
+    return Field(height_px=height_px, width_px=width_px, y_center_coordinate=y,
+                 x_center_coordinate=x, height_in_degrees=height_in_degrees or height_px,
+                 width_in_degrees=width_in_degrees or width_px, yslices=[slice(0, height_px)],
+                 xslices=[slice(0, width_px)], output_yslices=[slice(0, height_px)],
+                 output_xslices=[slice(0, width_px)], roi_ids=[roi_id], offsets=[roi_id / 10])
+
+
+class MultiROITest(TestCase):
+    """ Test ROI and Field logic on synthetic ROI definitions (no data files needed). """
+
+    def test_interpolation(self):
+        """Interpolated fields match np.interp on each scanfield attribute."""
+        zs = [84, 144, 200]
+        pixel_resolutions = [(2, 10), (492, 300), (100, 51)]
+        centers = [(-1.3, 0.25), (0.7, 1.5), (2.1, -0.4)]
+        sizes = [(0.9416, 3.1), (1.5, 0.35), (0.1, 2.7)]
+        roi = ROI(make_roi_info(zs, pixel_resolutions, centers, sizes))
+
+        depths = list(range(80, 205))
+        fields = roi.get_fields_at(depths)
+        for depth, field in zip(depths, fields):
+            single_field = roi.get_field_at(depth)
+            if depth < zs[0] or depth > zs[-1]:
+                self.assertIsNone(field)
+                self.assertIsNone(single_field)
+                continue
+
+            def interp(values):
+                return np.interp(depth, zs, values)
+            expected = (int(round(interp([r[1] for r in pixel_resolutions]) / 2)) * 2,
+                        int(round(interp([r[0] for r in pixel_resolutions]) / 2)) * 2,
+                        interp([c[1] for c in centers]), interp([c[0] for c in centers]),
+                        interp([s[1] for s in sizes]), interp([s[0] for s in sizes]))
+            for f in [field, single_field]:
+                self.assertEqual((f.height_px, f.width_px, f.y_center_coordinate,
+                                  f.x_center_coordinate, f.height_in_degrees,
+                                  f.width_in_degrees), expected)
+                self.assertEqual(f.depth, depth)
+
+        # Interior depth where a lerp that is not np.interp's rounds to a different size
+        self.assertEqual(roi.get_field_at(114).height_px, 156)
+        self.assertEqual(roi.get_field_at(114).width_px, 246)
+
+    def test_contiguity_tolerance(self):
+        """Adjacent fields are found with np.isclose tolerance against the center coordinates."""
+        field1 = Field(y_center_coordinate=0, x_center_coordinate=9.5559, height_in_degrees=1,
+                       width_in_degrees=0.9416)
+        field2 = Field(y_center_coordinate=0, x_center_coordinate=10.4976, height_in_degrees=1,
+                       width_in_degrees=0.9416)
+        self.assertEqual(field1._type_of_contiguity(field2), Position.RIGHT)
+        self.assertEqual(field2._type_of_contiguity(field1), Position.LEFT)
+        self.assertEqual(Field.pairwise_contiguity([field1, field2]).tolist(),
+                         [[Position.NONCONTIGUOUS, Position.RIGHT],
+                          [Position.LEFT, Position.NONCONTIGUOUS]])
+
+    def test_roi_without_scanfields(self):
+        """An ROI with no scanfields (zs=[]) is not present at any depth."""
+        for discrete_plane_mode in [0, 1]:
+            roi = ROI({'zs': [], 'scanfields': [], 'discretePlaneMode': discrete_plane_mode})
+            self.assertIsNone(roi.get_field_at(10))
+            self.assertEqual(roi.get_fields_at([0, 10]), [None, None])
+            self.assertEqual(roi.scanfields, [])
+
+    def test_type_of_contiguity(self):
+        """Fields are classified as above/below/left/right only when they touch."""
+        field = Field(y_center_coordinate=0, x_center_coordinate=0, height_in_degrees=2,
+                      width_in_degrees=1)
+        def position_of(y, x, height=2, width=1):
+            field2 = Field(y_center_coordinate=y, x_center_coordinate=x,
+                           height_in_degrees=height, width_in_degrees=width)
+            return field._type_of_contiguity(field2)
+
+        self.assertEqual(position_of(0, 1), Position.RIGHT)
+        self.assertEqual(position_of(0, -1), Position.LEFT)
+        self.assertEqual(position_of(2, 0), Position.BELOW)
+        self.assertEqual(position_of(-2, 0), Position.ABOVE)
+        self.assertEqual(position_of(0, 1.5, width=2), Position.RIGHT)
+        self.assertEqual(position_of(0, 3), Position.NONCONTIGUOUS)  # same height, not touching
+        self.assertEqual(position_of(0, 1, height=1), Position.NONCONTIGUOUS)  # diff height
+        self.assertEqual(position_of(5, 5), Position.NONCONTIGUOUS)
+        self.assertEqual(position_of(10, 1), Position.NONCONTIGUOUS)  # touching x, other row
+        self.assertEqual(position_of(2, 3), Position.NONCONTIGUOUS)  # touching y, other column
+        self.assertFalse(field.is_contiguous_to(Field(y_center_coordinate=0, x_center_coordinate=3,
+                                                      height_in_degrees=2, width_in_degrees=1)))
+
+    def test_interpolation_at_interior_depth(self):
+        """Fields between two scanfields are interpolated linearly."""
+        roi = ROI(make_roi_info([0, 10], [(100, 200), (300, 400)], [(0, 0), (2, -4)],
+                                [(1, 2), (3, 6)]))
+        field = roi.get_field_at(5)
+        self.assertEqual((field.height_px, field.width_px), (300, 200))
+        self.assertEqual((field.y_center_coordinate, field.x_center_coordinate), (-2, 1))
+        self.assertEqual((field.height_in_degrees, field.width_in_degrees), (4, 2))
+        self.assertEqual(field.depth, 5)
+        self.assertIsNone(roi.get_field_at(11))
+
+    def test_matlab_string_roi_info(self):
+        """ROI definitions with raw MATLAB strings are parsed as the equivalent values."""
+        parsed_info = make_roi_info([0, 10], [(100, 200), (300, 400)], [(0, 0), (2, -4)],
+                                    [(1, 2), (3, 6)])
+        raw_info = {'zs': '[0 10]', 'discretePlaneMode': '0',
+                    'scanfields': [{'pixelResolutionXY': '[100 200]', 'centerXY': '[0 0]',
+                                    'sizeXY': '[1 2]'},
+                                   {'pixelResolutionXY': '[300 400]', 'centerXY': '[2 -4]',
+                                    'sizeXY': '[3 6]'}]}
+        for depth in [0, 3, 10]:
+            parsed_field = ROI(parsed_info).get_field_at(depth)
+            raw_field = ROI(raw_info).get_field_at(depth)
+            self.assertEqual((raw_field.height_px, raw_field.width_px, raw_field.depth,
+                              raw_field.y_center_coordinate, raw_field.x_center_coordinate,
+                              raw_field.height_in_degrees, raw_field.width_in_degrees),
+                             (parsed_field.height_px, parsed_field.width_px, parsed_field.depth,
+                              parsed_field.y_center_coordinate, parsed_field.x_center_coordinate,
+                              parsed_field.height_in_degrees, parsed_field.width_in_degrees))
+
+        # Discrete plane mode given as a string
+        raw_info['discretePlaneMode'] = '1'
+        self.assertIsNone(ROI(raw_info).get_field_at(3))
+        self.assertEqual(ROI(raw_info).get_field_at(10).height_px, 400)
+
+    def test_pairwise_contiguity(self):
+        """Vectorized pairwise_contiguity agrees with _type_of_contiguity on a tiled grid."""
+        heights = [0.9416, 1.3, 0.5117]  # one per row
+        widths = [0.7, 1.1313, 0.3, 2.0]  # one per column
+        ys = np.cumsum(heights) - np.array(heights) / 2 - 1.7
+        xs = np.cumsum(widths) - np.array(widths) / 2 + 9.5559
+        fields = [Field(y_center_coordinate=y, x_center_coordinate=x, height_in_degrees=height,
+                        width_in_degrees=width) for y, height in zip(ys, heights)
+                  for x, width in zip(xs, widths)]
+        fields.append(Field(y_center_coordinate=20, x_center_coordinate=20, height_in_degrees=1,
+                            width_in_degrees=1))  # isolated field
+
+        positions = Field.pairwise_contiguity(fields)
+        self.assertEqual(positions.dtype, np.int8)
+        for i, field1 in enumerate(fields):
+            for j, field2 in enumerate(fields):
+                self.assertEqual(positions[i, j], field1._type_of_contiguity(field2))
+        self.assertEqual(positions[0, 1], Position.RIGHT)
+        self.assertEqual(positions[1, 0], Position.LEFT)
+        self.assertEqual(positions[4, 0], Position.ABOVE)  # same width, one row apart
+        self.assertEqual(positions[0, 4], Position.BELOW)
+        self.assertEqual(positions[0, 5], Position.NONCONTIGUOUS)  # diagonal, different size
+        self.assertTrue(np.all(positions[-1] == Position.NONCONTIGUOUS))
+
+        # Equal-size diagonal neighbours touch only at a corner: not contiguous
+        diagonal_fields = [Field(y_center_coordinate=y, x_center_coordinate=x,
+                                 height_in_degrees=2, width_in_degrees=1)
+                           for y, x in [(0, 0), (2, 1), (-2, 1), (2, -1), (-2, -1)]]
+        self.assertTrue(np.all(Field.pairwise_contiguity(diagonal_fields) ==
+                               Position.NONCONTIGUOUS))
+        for field2 in diagonal_fields[1:]:
+            self.assertEqual(diagonal_fields[0]._type_of_contiguity(field2),
+                             Position.NONCONTIGUOUS)
+            self.assertFalse(diagonal_fields[0].is_contiguous_to(field2))
+
+        # Same size and touching along x, but offset in y: not contiguous
+        offset_fields = [Field(y_center_coordinate=0, x_center_coordinate=0, height_in_degrees=2,
+                               width_in_degrees=1),
+                         Field(y_center_coordinate=10, x_center_coordinate=1, height_in_degrees=2,
+                               width_in_degrees=1)]
+        self.assertEqual(offset_fields[0]._type_of_contiguity(offset_fields[1]),
+                         Position.NONCONTIGUOUS)
+        self.assertTrue(np.all(Field.pairwise_contiguity(offset_fields) == Position.NONCONTIGUOUS))
+
+    def test_join_with_noncontiguous(self):
+        """Joining fields that do not touch raises instead of corrupting the field."""
+        field1 = Field(height_px=2, width_px=2, y_center_coordinate=0, x_center_coordinate=0,
+                       height_in_degrees=1, width_in_degrees=1, yslices=[slice(0, 2)],
+                       xslices=[slice(0, 2)], output_yslices=[slice(0, 2)],
+                       output_xslices=[slice(0, 2)], roi_ids=[0], offsets=[0])
+        field2 = Field(height_px=2, width_px=2, y_center_coordinate=0, x_center_coordinate=5,
+                       height_in_degrees=1, width_in_degrees=1, yslices=[slice(0, 2)],
+                       xslices=[slice(2, 4)], output_yslices=[slice(0, 2)],
+                       output_xslices=[slice(0, 2)], roi_ids=[1], offsets=[0])
+        with self.assertRaises(ValueError):
+            field1.join_with(field2)
+        self.assertEqual(field1.roi_ids, [0])
+
+    def test_parsed_matlab_strings_are_not_shared(self):
+        """Modifying a parsed value does not change later parses of the same string."""
+        value = _as_python_value('[512 256]')
+        value.append(1)
+        self.assertEqual(_as_python_value('[512 256]'), [512, 256])
+
+    def test_roi_mask(self):
+        """ROI masks of joined fields show which ROI each pixel comes from."""
+        # Side by side (ids broadcast along columns)
+        field = make_field(0, 0, 2, 3, 0)
+        field.join_with(make_field(0, 3, 2, 3, 1))
+        expected = np.array([[0, 0, 0, 1, 1, 1]] * 2, dtype=np.int8)
+        self.assertTrue(np.array_equal(field.roi_mask, expected))
+        self.assertEqual(field.roi_mask.dtype, np.int8)
+        self.assertTrue(np.allclose(field.offset_mask, expected / 10))
+
+        # Stacked (ids broadcast along rows); field2 is above
+        field = make_field(0, 0, 2, 3, 0)
+        field.join_with(make_field(-3, 0, 4, 3, 1))
+        expected = np.array([[1] * 3] * 4 + [[0] * 3] * 2, dtype=np.int8)
+        self.assertTrue(np.array_equal(field.roi_mask, expected))
+
+        # 2 x 2 grid: rows joined first, then both rows stacked
+        top = make_field(0, 0, 2, 2, 0)
+        top.join_with(make_field(0, 2, 2, 2, 1))
+        bottom = make_field(2, 0, 2, 2, 2)
+        bottom.join_with(make_field(2, 2, 2, 2, 3))
+        top.join_with(bottom)
+        expected = np.array([[0, 0, 1, 1], [0, 0, 1, 1], [2, 2, 3, 3], [2, 2, 3, 3]],
+                            dtype=np.int8)
+        self.assertTrue(np.array_equal(top.roi_mask, expected))
+        self.assertTrue(np.allclose(top.offset_mask, expected / 10))
+
+    def test_mask_with_partial_coverage(self):
+        """Pixels not covered by any subfield are set to -1."""
+        field = Field(height_px=2, width_px=4, yslices=[slice(0, 2)], xslices=[slice(0, 2)],
+                      output_yslices=[slice(0, 2)], output_xslices=[slice(1, 3)], roi_ids=[5],
+                      offsets=[0.5])
+        expected = np.array([[-1, 5, 5, -1]] * 2)
+        self.assertTrue(np.array_equal(field.roi_mask, expected))
+        self.assertTrue(np.array_equal(field.offset_mask, np.where(expected == 5, 0.5, -1)))
+
+    def test_mask_after_join(self):
+        """Cached masks are recomputed after a join."""
+        field = make_field(0, 0, 2, 3, 0)
+        self.assertTrue(np.array_equal(field.roi_mask, np.zeros([2, 3])))
+        self.assertTrue(np.allclose(field.offset_mask, np.zeros([2, 3])))
+        self.assertFalse(field.roi_mask.flags.writeable)
+
+        field.join_with(make_field(0, 3, 2, 3, 1))
+        self.assertEqual(field.roi_mask.shape, (2, 6))
+        self.assertTrue(np.array_equal(field.roi_mask, [[0, 0, 0, 1, 1, 1]] * 2))
+        self.assertTrue(np.allclose(field.offset_mask, [[0, 0, 0, 0.1, 0.1, 0.1]] * 2))
\ No newline at end of file